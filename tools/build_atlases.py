@@ -2,29 +2,84 @@
 # tools/build_atlases.py
 # Deterministic atlas builder with:
 # - per-folder simplified or explicit config
-# - strict validation (schema, bounds, duplicates)
-# - safe placeholder handling (loaded once, copied)
+# - strict validation (schema, bounds, duplicates, overlaps)
+# - safe placeholder handling (loaded once, resized once per slot size)
 # - deterministic folder order (utf-8 byte sort)
+# - atlases built in parallel worker processes, slots decoded on threads
 # - filename path traversal protection
+# - atlases skipped when outputs are newer than sources (--force rebuilds all)
 #
 # Exits with non-zero on serious errors so CI fails visibly.
 
 import os
 import sys
+import argparse
 import json
-from typing import Dict, List, Any, Optional
+import stat
+import pickle
+import hashlib
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from typing import Dict, List, Any, Optional, Tuple, Callable
+import fastjsonschema
+import numpy as np
 from PIL import Image, UnidentifiedImageError
 
+try:
+    import orjson  # optional: faster config parse / mapping emit
+except ImportError:
+    orjson = None
+
 # --- Constants / limits ---
 ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
 SRC_DIR = os.path.join(ROOT, "atlases_src")
 OUT_DIR = os.path.join(ROOT, "atlases")
+CACHE_DIR = os.path.join(ROOT, ".atlas_cache")
 
 MAX_CANVAS = 2048         # per audit: enforce maximum canvas size
 DEFAULT_CANVAS = 2048
 DEFAULT_SLOT = 512
 DEFAULT_COLS = 4
 DEFAULT_ROWS = 4
+# zlib level for atlas PNGs (override with ATLAS_PNG_LEVEL); outputs are committed, so keep them small
+DEFAULT_PNG_LEVEL = 6
+WRITE_BUFFER = 1 << 20    # output file buffer size, so encoders hand the OS large chunks
+
+# Compiled once at import; the single source for types and per-field ranges.
+# Draft-04 so that 1.0 is not accepted as an integer.
+CANVAS_DIM = {"type": "integer", "minimum": 1, "maximum": MAX_CANVAS}
+CANVAS_SCHEMA = {
+    "$schema": "http://json-schema.org/draft-04/schema#",
+    "type": "object",
+    "required": ["canvas_width", "canvas_height"],
+    "properties": {"canvas_width": CANVAS_DIM, "canvas_height": CANVAS_DIM},
+}
+CONFIG_SCHEMA = {
+    "$schema": "http://json-schema.org/draft-04/schema#",
+    "type": "object",
+    "required": ["canvas_width", "canvas_height", "slots"],
+    "properties": {
+        "canvas_width": CANVAS_DIM,
+        "canvas_height": CANVAS_DIM,
+        "slots": {
+            "type": "array",
+            "minItems": 1,
+            "items": {
+                "type": "object",
+                "required": ["index", "x", "y", "w", "h"],
+                "properties": {
+                    "index": {"type": "integer", "minimum": 1},
+                    "x": {"type": "integer", "minimum": 0, "maximum": MAX_CANVAS},
+                    "y": {"type": "integer", "minimum": 0, "maximum": MAX_CANVAS},
+                    "w": {"type": "integer", "minimum": 1, "maximum": MAX_CANVAS},
+                    "h": {"type": "integer", "minimum": 1, "maximum": MAX_CANVAS},
+                    "filename": {"type": ["string", "null"]},
+                },
+            },
+        },
+    },
+}
+VALIDATE_CANVAS = fastjsonschema.compile(CANVAS_SCHEMA)
+VALIDATE_CONFIG = fastjsonschema.compile(CONFIG_SCHEMA)
 
 # --- Helpers -----------------------------------------------------------------
 def err(msg: str):
@@ -33,17 +88,75 @@ def err(msg: str):
 def warn(msg: str):
     print(f"[WARN] {msg}")
 
-def safe_open_image(path: str) -> Optional[Image.Image]:
-    """Open and return a persistent Image (or None on failure)."""
+def png_compress_level() -> int:
+    """Return the PNG zlib level from ATLAS_PNG_LEVEL (0-9), or the default. Raises ValueError."""
+    raw = os.environ.get("ATLAS_PNG_LEVEL")
+    if raw is None or raw.strip() == "":
+        return DEFAULT_PNG_LEVEL
+    try:
+        level = int(raw)
+    except ValueError:
+        raise ValueError(f"ATLAS_PNG_LEVEL must be an integer 0-9, got '{raw}'.")
+    if not 0 <= level <= 9:
+        raise ValueError(f"ATLAS_PNG_LEVEL must be an integer 0-9, got {level}.")
+    return level
+
+def safe_open_image(path: str, size: Optional[Tuple[int, int]] = None) -> Optional[Image.Image]:
+    """
+    Open and return a persistent Image (or None on failure).
+    If size is given, JPEGs are decoded at the smallest DCT scale still >= size.
+    """
     try:
         img = Image.open(path)
-        return img.convert("RGBA")
+        if size is not None:
+            img.draft("RGB", size)  # no-op for formats without draft support (PNG)
+        img.load()
+        # most atlas sources are already RGBA; skip the full-image convert copy
+        # (palette images with transparency still go through convert)
+        return img if img.mode == "RGBA" else img.convert("RGBA")
     except UnidentifiedImageError as e:
         err(f"Unrecognized image file '{path}': {e}")
     except Exception as e:
         err(f"Failed opening image '{path}': {e}")
     return None
 
+def load_json(f) -> Any:
+    """Parse JSON from a binary file object."""
+    if orjson is not None:
+        return orjson.loads(f.read())
+    return json.load(f)
+
+def dump_json(obj: Any) -> bytes:
+    """Serialize obj as 2-space indented UTF-8 JSON."""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2)
+    return json.dumps(obj, indent=2, ensure_ascii=False).encode("utf-8")
+
+def fit_to_slot(img: Image.Image, w_slot: int, h_slot: int) -> Image.Image:
+    """Return img scaled to exactly w_slot x h_slot, skipping work where possible."""
+    w_img, h_img = img.size
+    if (w_img, h_img) == (w_slot, h_slot):
+        return img
+    # exact power-of-2 downscale: integer box average, no LANCZOS pass needed
+    if w_img % w_slot == 0 and h_img % h_slot == 0:
+        factor = w_img // w_slot
+        if factor == h_img // h_slot and factor & (factor - 1) == 0:
+            return img.reduce(factor)
+    # Heavy downscales: integer box-reduce (premultiplied for RGBA) while keeping
+    # at least 3x of the slot for LANCZOS. reducing_gap can't do this for us:
+    # Pillow resizes RGBA via an internal RGBa pass that drops it.
+    down = (w_img // w_slot // 3 or 1, h_img // h_slot // 3 or 1)
+    if down != (1, 1):
+        img = img.reduce(down)
+    return img.resize((w_slot, h_slot), resample=Image.Resampling.LANCZOS)
+
+def load_slot_image(path: str, w_slot: int, h_slot: int) -> Optional[Image.Image]:
+    """Open path and fit it to the slot; None if the image could not be opened."""
+    img = safe_open_image(path, (w_slot, h_slot))
+    if img is None:
+        return None
+    return fit_to_slot(img, w_slot, h_slot)
+
 def is_safe_filename(name: str) -> bool:
     """Reject filenames that attempt path traversal or absolute paths."""
     if not isinstance(name, str) or name == "":
@@ -59,60 +172,89 @@ def is_safe_filename(name: str) -> bool:
 # --- Validation --------------------------------------------------------------
 def validate_slots(cfg: Dict[str, Any]) -> None:
     """
-    Validate the config dict: types, ranges, canvas limits, uniqueness, and slot bounds.
+    Validate the config dict: types, ranges, canvas limits, uniqueness, slot bounds, and overlaps.
     Raises ValueError on invalid config.
     """
-    canvas_w = cfg.get("canvas_width")
-    canvas_h = cfg.get("canvas_height")
-    if not isinstance(canvas_w, int) or not isinstance(canvas_h, int):
-        raise ValueError("canvas_width and canvas_height must be integers.")
-    if canvas_w <= 0 or canvas_h <= 0:
-        raise ValueError("canvas dimensions must be positive.")
-    if canvas_w > MAX_CANVAS or canvas_h > MAX_CANVAS:
-        raise ValueError(f"canvas dimensions must be <= {MAX_CANVAS}.")
-
-    slots = cfg.get("slots")
-    if not isinstance(slots, list) or len(slots) == 0:
-        raise ValueError("slots must be a non-empty list after config processing.")
+    # Types and per-field ranges come from the precompiled schema; only the
+    # cross-field rules the schema cannot express are checked here.
+    run_schema(VALIDATE_CONFIG, cfg)
+    slots = cfg["slots"]
+    canvas_w = cfg["canvas_width"]
+    canvas_h = cfg["canvas_height"]
 
     seen_indices = set()
-    for s in slots:
-        if not isinstance(s, dict):
-            raise ValueError("each slot entry must be an object/dict.")
-        idx = s.get("index")
-        x = s.get("x"); y = s.get("y"); w = s.get("w"); h = s.get("h")
-        if not isinstance(idx, int) or idx < 1:
-            raise ValueError("slot 'index' must be integer >= 1.")
+    for idx in (s["index"] for s in slots):
         if idx in seen_indices:
             raise ValueError(f"duplicate slot index detected: {idx}")
         seen_indices.add(idx)
-        for name, val in (("x", x), ("y", y), ("w", w), ("h", h)):
-            if not isinstance(val, int):
-                raise ValueError(f"slot {idx} property '{name}' must be integer.")
-        if w <= 0 or h <= 0:
-            raise ValueError(f"slot {idx} must have positive width/height.")
-        if x < 0 or y < 0 or (x + w) > canvas_w or (y + h) > canvas_h:
-            raise ValueError(f"slot {idx} bounds exceed canvas: x={x},y={y},w={w},h={h}, canvas={canvas_w}x{canvas_h}")
 
+    # schema caps every coordinate at MAX_CANVAS, so int64 cannot overflow
+    xs, ys, ws, hs = (np.fromiter((s[name] for s in slots), dtype=np.int64, count=len(slots))
+                      for name in ("x", "y", "w", "h"))
+    outside = np.flatnonzero((xs + ws > canvas_w) | (ys + hs > canvas_h))
+    if outside.size:
+        s = slots[outside[0]]
+        raise ValueError(f"slot {s['index']} bounds exceed canvas: x={s['x']},y={s['y']},w={s['w']},h={s['h']}, canvas={canvas_w}x{canvas_h}")
+
+    for s in slots:
         filename = s.get("filename")
-        if filename is not None:
-            if not is_safe_filename(filename):
-                raise ValueError(f"slot {idx} filename is unsafe: '{filename}'")
+        if filename is not None and not is_safe_filename(filename):
+            raise ValueError(f"slot {s['index']} filename is unsafe: '{filename}'")
+
+    # Slots are blitted, not composited, so they must not overlap. Mark each
+    # slot's area with its position + 1; stops at the first collision, so the
+    # cost stays within one pass over the canvas.
+    owner = np.zeros((canvas_h, canvas_w), dtype=np.int32)
+    for k, (x, y, w, h) in enumerate(zip(xs.tolist(), ys.tolist(), ws.tolist(), hs.tolist())):
+        area = owner[y:y + h, x:x + w]
+        taken = area[area != 0]
+        if taken.size:
+            raise ValueError(f"slot {slots[k]['index']} overlaps slot {slots[taken[0] - 1]['index']}")
+        area[:] = k + 1
+
+def run_schema(validator: Callable[[Any], Any], data: Any) -> None:
+    """Run a compiled schema validator, raising ValueError built from the failing path and rule."""
+    try:
+        validator(data)
+    except fastjsonschema.JsonSchemaException as e:
+        raise ValueError(describe_schema_error(e)) from None
+
+def describe_schema_error(e: "fastjsonschema.JsonSchemaException") -> str:
+    """Turn a fastjsonschema failure into a message like 'slots[2].w must be >= 1.'."""
+    # path starts with the root name 'data'; list positions arrive as digit strings
+    parts = (e.path or [])[1:]
+    where = "".join(f"[{p}]" if p.isdigit() else f".{p}" for p in parts).lstrip(".") or "config"
+    rule, defn = e.rule, e.rule_definition
+    if rule == "type":
+        what = " or ".join(defn) if isinstance(defn, list) else defn
+        return f"{where} must be {what}."
+    if rule == "minimum":
+        return f"{where} must be >= {defn}."
+    if rule == "maximum":
+        return f"{where} must be <= {defn}."
+    if rule == "minItems":
+        return f"{where} must have at least {defn} entries."
+    if rule == "required":
+        missing = [k for k in defn if not isinstance(e.value, dict) or k not in e.value]
+        return f"{where} is missing required properties: {', '.join(missing)}."
+    return e.message
 
 # --- Config loading ---------------------------------------------------------
 def generate_grid_slots(cols: int, rows: int, slot_w: int, slot_h: int) -> List[Dict[str, Any]]:
     slots = []
-    for i in range(rows * cols):
-        col = i % cols
-        row = i // cols
-        slots.append({
-            "index": i + 1,
-            "x": col * slot_w,
-            "y": row * slot_h,
-            "w": slot_w,
-            "h": slot_h,
-            "filename": f"{i + 1}.png"
-        })
+    append = slots.append
+    for row in range(rows):
+        y = row * slot_h
+        for col in range(cols):
+            i = row * cols + col + 1
+            append({
+                "index": i,
+                "x": col * slot_w,
+                "y": y,
+                "w": slot_w,
+                "h": slot_h,
+                "filename": f"{i}.png"
+            })
     return slots
 
 def load_config(folder: str) -> Dict[str, Any]:
@@ -122,7 +264,11 @@ def load_config(folder: str) -> Dict[str, Any]:
     Performs basic parsing; detailed validation is done in validate_slots().
     """
     config_path = os.path.join(folder, "config.json")
-    if not os.path.isfile(config_path):
+    try:
+        st = os.stat(config_path)
+    except OSError:
+        st = None
+    if st is None or not stat.S_ISREG(st.st_mode):
         # default grid
         return {
             "canvas_width": DEFAULT_CANVAS,
@@ -130,9 +276,63 @@ def load_config(folder: str) -> Dict[str, Any]:
             "slots": generate_grid_slots(DEFAULT_COLS, DEFAULT_ROWS, DEFAULT_SLOT, DEFAULT_SLOT)
         }
 
+    # Parsed+validated configs are cached across runs as <path hash>-<state hash>.pkl;
+    # an edit changes mtime/size and misses, and the write prunes the old entry.
+    path_key = blake2b_hex(config_path)
+    # the builder's own mtime/size is part of the key, so any change to defaults,
+    # limits, normalization or validation in this file invalidates every entry
+    builder = os.stat(__file__)
+    state_key = blake2b_hex(f"{builder.st_mtime_ns}:{builder.st_size}:{st.st_mtime_ns}:{st.st_size}")
+    cache_path = os.path.join(CACHE_DIR, f"{path_key}-{state_key}.pkl")
+    cfg = read_config_cache(cache_path)
+    if cfg is None:
+        cfg = parse_config(config_path)
+        write_config_cache(cache_path, cfg)
+        prune_config_cache(path_key, cache_path)
+    return cfg
+
+def blake2b_hex(text: str) -> str:
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+
+def read_config_cache(cache_path: str) -> Optional[Dict[str, Any]]:
+    """Return the cached config, or None on a miss or unreadable entry."""
+    try:
+        with open(cache_path, "rb") as f:
+            cfg = pickle.load(f)
+    except Exception:
+        return None
+    return cfg if isinstance(cfg, dict) else None
+
+def write_config_cache(cache_path: str, cfg: Dict[str, Any]) -> None:
+    """Store cfg atomically; a failed write only costs a re-parse next run."""
+    tmp_path = f"{cache_path}.{os.getpid()}.tmp"
     try:
-        with open(config_path, "r", encoding="utf-8") as f:
-            raw = json.load(f)
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        with open(tmp_path, "wb") as f:
+            pickle.dump(cfg, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, cache_path)
+    except OSError as e:
+        warn(f"could not write config cache '{cache_path}': {e}")
+
+def prune_config_cache(path_key: str, keep_path: str) -> None:
+    """Delete cache entries for the same config.json other than keep_path."""
+    try:
+        with os.scandir(CACHE_DIR) as it:
+            stale = [e.path for e in it
+                     if e.name.startswith(f"{path_key}-") and e.name.endswith(".pkl") and e.path != keep_path]
+    except OSError:
+        return
+    for path in stale:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+def parse_config(config_path: str) -> Dict[str, Any]:
+    """Parse, normalize and validate an existing config.json."""
+    try:
+        with open(config_path, "rb") as f:
+            raw = load_json(f)
     except Exception as e:
         raise ValueError(f"failed to parse config.json: {e}")
 
@@ -163,9 +363,8 @@ def load_config(folder: str) -> Dict[str, Any]:
     canvas_w = int(raw.get("canvas_width", cols * slot_w))
     canvas_h = int(raw.get("canvas_height", rows * slot_h))
 
-    # Quick bounds check before generating
-    if canvas_w > MAX_CANVAS or canvas_h > MAX_CANVAS:
-        raise ValueError(f"generated canvas ({canvas_w}x{canvas_h}) exceeds MAX_CANVAS {MAX_CANVAS}.")
+    # Check canvas limits before generating a possibly huge slot list
+    run_schema(VALIDATE_CANVAS, {"canvas_width": canvas_w, "canvas_height": canvas_h})
 
     slots = generate_grid_slots(cols, rows, slot_w, slot_h)
     cfg = {"canvas_width": canvas_w, "canvas_height": canvas_h, "slots": slots}
@@ -173,84 +372,165 @@ def load_config(folder: str) -> Dict[str, Any]:
     return cfg
 
 # --- Atlas build ------------------------------------------------------------
-def build_atlas(atlas_name: str, src_folder: str, out_folder: str):
+def atlas_outputs(atlas_name: str, out_folder: str) -> Tuple[str, str]:
+    """Return the (png, json) output paths for an atlas."""
+    return (os.path.join(out_folder, f"atlas_{atlas_name}.png"),
+            os.path.join(out_folder, f"atlas_{atlas_name}.json"))
+
+def png_level_stamp(out_png: str) -> str:
+    """Path of the file recording which zlib level out_png was last written with."""
+    return os.path.join(CACHE_DIR, blake2b_hex(out_png) + ".level")
+
+def built_png_level(out_png: str) -> int:
+    """Level out_png was built with; outputs without a stamp (e.g. from CI) used the default."""
+    try:
+        with open(png_level_stamp(out_png), "r", encoding="utf-8") as f:
+            return int(f.read())
+    except (OSError, ValueError):
+        return DEFAULT_PNG_LEVEL
+
+def outputs_up_to_date(src_folder: str, out_png: str, out_json: str, png_level: int) -> bool:
+    """True if both outputs exist, used png_level, and are newer than every input (make-style)."""
+    # a PNG encoded at another level (e.g. a local ATLAS_PNG_LEVEL=1 run) is stale
+    if built_png_level(out_png) != png_level:
+        return False
+    try:
+        out_mtime = min(os.stat(out_png).st_mtime_ns, os.stat(out_json).st_mtime_ns)
+        # the folder's own mtime catches deleted files; this script's catches builder changes
+        latest_src = max(os.stat(src_folder).st_mtime_ns, os.stat(__file__).st_mtime_ns)
+        with os.scandir(src_folder) as it:
+            latest_src = max([latest_src] + [e.stat().st_mtime_ns for e in it])
+    except OSError:
+        return False  # let the build itself surface the error
+    return out_mtime > latest_src
+
+def build_atlas(atlas_name: str, src_folder: str, out_folder: str, max_threads: int = 8):
     os.makedirs(out_folder, exist_ok=True)
+    out_png, out_json = atlas_outputs(atlas_name, out_folder)
 
     # Load config (may raise ValueError)
     cfg = load_config(src_folder)
     canvas_w = cfg["canvas_width"]
     canvas_h = cfg["canvas_height"]
-    canvas = Image.new("RGBA", (canvas_w, canvas_h), (0, 0, 0, 0))
+    # Slots are plain rectangles on a transparent canvas, so they are blitted
+    # straight into an RGBA buffer instead of alpha-composited with paste().
+    canvas_arr = np.zeros((canvas_h, canvas_w, 4), dtype=np.uint8)
+
+    # One directory scan instead of an isfile() stat per slot
+    with os.scandir(src_folder) as it:
+        present = {e.name for e in it if e.is_file()}
 
     placeholder_path = os.path.join(src_folder, "placeholder.png")
     placeholder_img = None
-    if os.path.isfile(placeholder_path):
+    if "placeholder.png" in present:
         placeholder_img = safe_open_image(placeholder_path)
         if placeholder_img is None:
             raise RuntimeError(f"placeholder.png present but could not be opened in '{atlas_name}'")
     # placeholder_img left as None if missing
 
-    slots = sorted(cfg["slots"], key=lambda s: int(s["index"]))  # deterministic slot order
-
-    mapping = {}
-    for slot in slots:
-        idx = int(slot["index"])
-        filename = slot.get("filename") or f"{idx}.png"
+    slots = sorted(cfg["slots"], key=lambda s: s["index"])  # deterministic slot order
 
-        # Safety: reject dangerous filenames
-        if not is_safe_filename(filename):
-            raise ValueError(f"unsafe filename '{filename}' in atlas '{atlas_name}' slot {idx}")
+    # Pack slot geometry once into per-field columns (SoA) so the loops below
+    # read plain ints by position instead of doing dict lookups + int() per use.
+    idxs, xs, ys, ws, hs = map(list, zip(*((s["index"], s["x"], s["y"], s["w"], s["h"]) for s in slots)))
+    filenames = [s.get("filename") or f"{s['index']}.png" for s in slots]
 
-        src_path = os.path.join(src_folder, filename)
-        img = None
-        source_used = None
+    # Phase 1: resolve each slot's source and queue decode+resize on worker
+    # threads (Pillow releases the GIL there).
+    mapping = {}
+    jobs = []
+    placeholder_cache: Dict[Tuple[int, int], Future] = {}
+    # every resized image is held until phase 2 anyway, so this needs no size cap
+    resized_cache: Dict[Tuple[str, int, int], Future] = {}
+    with ThreadPoolExecutor(max_workers=max(1, min(max_threads, len(slots)))) as ex:
+        for k in range(len(slots)):
+            idx = idxs[k]
+            filename = filenames[k]
+
+            # Safety: reject dangerous filenames
+            if not is_safe_filename(filename):
+                raise ValueError(f"unsafe filename '{filename}' in atlas '{atlas_name}' slot {idx}")
 
-        if os.path.isfile(src_path):
-            img = safe_open_image(src_path)
+            src_path = os.path.join(src_folder, filename)
+            source_used = None
+            w_slot = ws[k]; h_slot = hs[k]
+            fut = None
+
+            if filename in present:
+                # decode+resize a repeated tile once, paste it many times
+                key = (filename, w_slot, h_slot)
+                if key not in resized_cache:
+                    resized_cache[key] = ex.submit(load_slot_image, src_path, w_slot, h_slot)
+                fut = resized_cache[key]
+                source_used = filename
+            elif placeholder_img is not None:
+                # resize the placeholder once per slot size; paste never mutates the source
+                key = (w_slot, h_slot)
+                if key not in placeholder_cache:
+                    placeholder_cache[key] = ex.submit(fit_to_slot, placeholder_img.copy(), w_slot, h_slot)
+                fut = placeholder_cache[key]
+                source_used = "placeholder.png"
+            else:
+                # leave transparent slot
+                source_used = None
+                warn(f"Atlas '{atlas_name}': missing '{filename}' and no placeholder -> leaving transparent slot {idx}.")
+
+            jobs.append((k, src_path, fut))
+            mapping[str(idx)] = {
+                "x": xs[k], "y": ys[k],
+                "w": w_slot, "h": h_slot,
+                "source": source_used
+            }
+
+        # Phase 2: paste in deterministic index order on this thread
+        for k, src_path, fut in jobs:
+            if fut is None:
+                continue
+            img = fut.result()
             if img is None:
                 raise RuntimeError(f"Failed opening '{src_path}' for atlas '{atlas_name}'.")
-            source_used = filename
-        elif placeholder_img is not None:
-            img = placeholder_img.copy()  # use a fresh copy for deterministic mutations
-            source_used = "placeholder.png"
-        else:
-            # leave transparent slot
-            source_used = None
-            warn(f"Atlas '{atlas_name}': missing '{filename}' and no placeholder -> leaving transparent slot {idx}.")
-
-        # Resize & paste if we have an image
-        if img is not None:
-            # resize to fit exactly into slot dimensions
-            w_slot = int(slot["w"]); h_slot = int(slot["h"])
-            img = img.resize((w_slot, h_slot), resample=Image.LANCZOS)
-            canvas.paste(img, (int(slot["x"]), int(slot["y"])), img)
-            
-        mapping[str(idx)] = {
-            "x": int(slot["x"]), "y": int(slot["y"]),
-            "w": int(slot["w"]), "h": int(slot["h"]),
-            "source": source_used
-        }
+            x = xs[k]; y = ys[k]
+            canvas_arr[y:y + img.height, x:x + img.width] = np.asarray(img)
 
-    out_png = os.path.join(out_folder, f"atlas_{atlas_name}.png")
-    out_json = os.path.join(out_folder, f"atlas_{atlas_name}.json")
-    canvas.save(out_png, format="PNG")
-    with open(out_json, "w", encoding="utf-8") as jf:
-        json.dump({"name": atlas_name, "width": canvas_w, "height": canvas_h, "slots": mapping}, jf, indent=2)
+    png_level = png_compress_level()
+    with open(out_png, "wb", buffering=WRITE_BUFFER) as pf:
+        Image.fromarray(canvas_arr).save(pf, format="PNG", compress_level=png_level, optimize=False)
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        with open(png_level_stamp(out_png), "w", encoding="utf-8") as f:
+            f.write(str(png_level))
+    except OSError as e:
+        warn(f"could not record PNG level for '{out_png}': {e}")
+    with open(out_json, "wb", buffering=WRITE_BUFFER) as jf:
+        jf.write(dump_json({"name": atlas_name, "width": canvas_w, "height": canvas_h, "slots": mapping}))
 
     print(f"[OK] Built atlas '{atlas_name}' -> {os.path.relpath(out_png)}")
 
 # --- Main -------------------------------------------------------------------
 def main():
+    parser = argparse.ArgumentParser(description="Build texture atlases from atlases_src/.")
+    parser.add_argument("--force", action="store_true",
+                        help="rebuild every atlas even if its outputs are newer than its sources")
+    args = parser.parse_args()
+
+    try:
+        png_level = png_compress_level()
+    except ValueError as ve:
+        err(str(ve))
+        sys.exit(1)
+
     if not os.path.isdir(SRC_DIR):
         err(f"Source folder not found: {SRC_DIR}")
         sys.exit(1)
 
     try:
         # Deterministic folder order using utf-8 byte sorting as requested
-        atlas_folders = sorted(
-            [d for d in os.listdir(SRC_DIR) if os.path.isdir(os.path.join(SRC_DIR, d))],
-            key=lambda x: x.encode('utf-8')
-        )
+        # (scandir's DirEntry.is_dir() reuses readdir info instead of a stat per entry)
+        with os.scandir(SRC_DIR) as it:
+            atlas_folders = sorted(
+                (e.name for e in it if e.is_dir()),
+                key=lambda x: x.encode('utf-8')
+            )
     except Exception as e:
         err(f"Failed to list atlas folders: {e}")
         sys.exit(1)
@@ -259,19 +539,45 @@ def main():
         warn("No atlas folders found in atlases_src/. Nothing to build.")
         sys.exit(0)
 
+    pending = []
     for name in atlas_folders:
-        src = os.path.join(SRC_DIR, name)
-        try:
-            build_atlas(name, src, OUT_DIR)
-        except ValueError as ve:
-            err(f"Config validation error for atlas '{name}': {ve}")
-            sys.exit(1)
-        except RuntimeError as re:
-            err(f"Runtime error building atlas '{name}': {re}")
-            sys.exit(1)
-        except Exception as e:
+        if not args.force and outputs_up_to_date(os.path.join(SRC_DIR, name), *atlas_outputs(name, OUT_DIR), png_level):
+            print(f"[SKIP] Atlas '{name}' is up to date")
+        else:
+            pending.append(name)
+
+    # Atlases are independent: build them in parallel, then report failures
+    # in folder order so the log stays deterministic. Cores are split between
+    # processes and their slot threads so the total stays near cpu_count.
+    cpus = os.cpu_count() or 1
+    workers = min(len(pending), cpus)
+    threads = max(1, min(8, cpus // max(1, workers)))
+    failures: Dict[str, BaseException] = {}
+    if workers <= 1:
+        for name in pending:
+            try:
+                build_atlas(name, os.path.join(SRC_DIR, name), OUT_DIR, threads)
+            except Exception as e:
+                failures[name] = e
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as ex:
+            futs = {ex.submit(build_atlas, name, os.path.join(SRC_DIR, name), OUT_DIR, threads): name
+                    for name in pending}
+            for f in as_completed(futs):
+                e = f.exception()
+                if e is not None:
+                    failures[futs[f]] = e
+
+    for name in atlas_folders:
+        e = failures.get(name)
+        if isinstance(e, ValueError):
+            err(f"Config validation error for atlas '{name}': {e}")
+        elif isinstance(e, RuntimeError):
+            err(f"Runtime error building atlas '{name}': {e}")
+        elif e is not None:
             err(f"Unexpected error building atlas '{name}': {e}")
-            sys.exit(1)
+    if failures:
+        sys.exit(1)
 
     print("[DONE] All atlases processed successfully.")
 